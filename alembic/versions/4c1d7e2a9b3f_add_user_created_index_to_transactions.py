@@ -0,0 +1,35 @@
+"""add user_id, created_at index to transaction_table
+
+Revision ID: 4c1d7e2a9b3f
+Revises: 9ebc7a59fece
+Create Date: 2026-10-15 10:12:41.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1d7e2a9b3f'
+down_revision: Union[str, Sequence[str], None] = '9ebc7a59fece'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the "last transaction" lookup and the per-user count.
+    # INCLUDE makes it covering on Postgres 11+; other dialects ignore it.
+    op.create_index(
+        'ix_txn_user_created',
+        'transaction_table',
+        ['user_id', sa.text('created_at DESC')],
+        postgresql_include=['latitude', 'longitude'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_txn_user_created', table_name='transaction_table')
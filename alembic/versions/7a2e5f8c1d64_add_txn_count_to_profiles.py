@@ -0,0 +1,40 @@
+"""add txn_count column to profiles
+
+Revision ID: 7a2e5f8c1d64
+Revises: 4c1d7e2a9b3f
+Create Date: 2026-10-15 11:03:27.918044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2e5f8c1d64'
+down_revision: Union[str, Sequence[str], None] = '4c1d7e2a9b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('profiles', sa.Column('txn_count', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+    # Backfill from existing transactions
+    op.execute(
+        """
+        UPDATE profiles
+        SET txn_count = (
+            SELECT COUNT(*)
+            FROM transaction_table
+            WHERE transaction_table.user_id = profiles.user_id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('profiles', 'txn_count')
@@ -1,11 +1,13 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from app.database import Base, engine
+from fastapi.responses import ORJSONResponse
+from app.database import Base, engine, async_engine
+from app.services import smtp_pool, device_service, redis_client, email_outbox
 from app.routers import auth, user, profile, pages, edit, services, transaction, text, url,customer_care
 # Import models to ensure tables are created
 from app.models import user as user_model, profile as profile_model, transaction as transaction_model, customer_care as customer_care_model, vishing as vishing_model, text as text_model, url as url_model
 
-app = FastAPI(title="Fraud Detection API")
+app = FastAPI(title="Fraud Detection API", default_response_class=ORJSONResponse)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -23,6 +25,24 @@ app.include_router(text.router)
 app.include_router(url.router)
 app.include_router(customer_care.router)
 
+@app.on_event("startup")
+async def start_email_outbox():
+    email_outbox.start()
+
+@app.on_event("shutdown")
+async def flush_email_outbox():
+    await email_outbox.stop()
+
+@app.on_event("shutdown")
+def close_smtp_sessions():
+    smtp_pool.close_all()
+
+@app.on_event("shutdown")
+async def close_async_resources():
+    await device_service.close_http_client()
+    await redis_client.close()
+    await async_engine.dispose()
+
 from app.config import settings
 import os
 print(f"DATABASE_URL from config: {settings.DATABASE_URL}")
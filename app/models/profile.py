@@ -12,4 +12,6 @@ class Profile(Base):
     upi_id = Column(String(50))
     country = Column(String(100), nullable=False, default="India")
     transaction_limit = Column(DECIMAL(10, 2))
+    # Maintained alongside transaction inserts/deletes so the hot path never runs COUNT(*)
+    txn_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=lambda: datetime.now(IST))
\ No newline at end of file
@@ -1,5 +1,5 @@
 # models/transaction.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, DECIMAL
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, DECIMAL, Index
 from app.models.constant import IST
 from app.database import Base
 from datetime import datetime
@@ -34,5 +34,13 @@ class Transaction(Base):
     minute = Column(Integer)
     is_night = Column(Boolean)
 
-    created_at = Column(DateTime, default=lambda: datetime.now(IST))
-    is_fraud = Column(Boolean, default=False)  # Model output
\ No newline at end of file
+    # Not indexed on its own, covered by ix_txn_user_created
+    created_at = Column(DateTime, default=lambda: datetime.now(IST), index=False)
+    is_fraud = Column(Boolean, default=False)  # Model output
+
+    __table_args__ = (
+        Index(
+            "ix_txn_user_created", user_id, created_at.desc(),
+            postgresql_include=["latitude", "longitude"]
+        ),
+    )
@@ -3,13 +3,15 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse, RedirectResponse
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from app.schemas.user import UserCreate
 from jose import JWTError, jwt
 from app.models.user import User
 from app.models.profile import Profile
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.config import settings
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 import random, os
 import aiosmtplib
 from email.message import EmailMessage
@@ -24,7 +26,6 @@ from email.mime.text import MIMEText
 load_dotenv()
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-templates = Jinja2Templates(directory="app/templates")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 otp_store = {}
 
@@ -50,30 +51,49 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
-async def get_current_user(
-    access_token: str = Cookie(default=None),
-    db: Session = Depends(get_db),
-):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials (missing token)",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+def _user_id_from_token(access_token: str) -> int:
     if not access_token:
-        raise credentials_exception
+        raise _credentials_exception()
 
     try:
         payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: int = payload.get("user_id")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    return user_id
+
+async def get_current_user(
+    access_token: str = Cookie(default=None),
+    db: Session = Depends(get_db),
+):
+    user_id = _user_id_from_token(access_token)
 
     user = db.query(User).filter(User.user_id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    return user
+
+async def get_current_user_async(
+    access_token: str = Cookie(default=None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Same as get_current_user, but loads the user through the request's AsyncSession"""
+    user_id = _user_id_from_token(access_token)
+
+    user = (await db.execute(select(User).where(User.user_id == user_id))).scalars().first()
+    if user is None:
+        raise _credentials_exception()
 
     return user
 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from sqlalchemy.orm import Session
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from fastapi import Request
 from app.utils import get_current_user as get_current_user_util
 from datetime import datetime
@@ -17,7 +17,6 @@ from app.routers.auth import get_current_user
 from app.services.fake_customer_service import verify_phone_number
 
 router = APIRouter(prefix="/customer_care", tags=["Customer Care"])
-templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
 @router.post("/verify")
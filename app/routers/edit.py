@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Form, Request, HTTPException, Depends, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from app.models.user import User
@@ -10,7 +10,6 @@ from app.routers.auth import get_current_user, get_password_hash, verify_passwor
 from typing import Optional
 
 router = APIRouter(prefix="/edit", tags=["Edit"])
-templates = Jinja2Templates(directory="app/templates")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # ------------------------------------------------USER EDIT ENDPOINTS----------------------------------------------------
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from app.utils import get_current_user, require_login
 from sqlalchemy.orm import Session
 from app.database import get_db
@@ -8,21 +8,8 @@ from app.models.transaction import Transaction
 from app.models.user import User
 from app.models.url import URLScan
 from app.models.customer_care import CustomerCare
-import json
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-
-# Add custom filter for parsing JSON
-def parse_json(text):
-    if not text:
-        return {}
-    try:
-        return json.loads(text)
-    except:
-        return {}
-
-templates.env.filters["from_json"] = parse_json
 
 @router.get("/", response_class=HTMLResponse)
 async def landing(request: Request):
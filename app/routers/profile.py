@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 from fastapi import status
 from app.schemas.profile import ProfileCreate
@@ -11,7 +11,6 @@ from app.models.user import User
 from sqlalchemy.orm.exc import NoResultFound
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/create", response_class=HTMLResponse)
 async def profile_create_page(request: Request,current_user: User = Depends(get_current_user)):
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, Form, Depends, UploadFile, File, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 import os
 import shutil
@@ -15,10 +15,6 @@ from app.routers.auth import get_current_user
 import logging
 
 router = APIRouter(prefix="/services", tags=["Services"])
-templates = Jinja2Templates(directory="app/templates")
-
-# Add the zip filter to Jinja2 environment
-templates.env.filters["zip"] = zip
 
 logger = logging.getLogger(__name__)
 
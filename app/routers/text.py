@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 from app.schemas.text import TextAnalysisCreate, TextAnalysisResponse, TextAnalysisResult, TextAnalysisComplete
 from app.models.text import TextAnalysis
@@ -15,7 +15,6 @@ from app.models.constant import IST
 import logging
 
 router = APIRouter(prefix="/text", tags=["Text Analysis"])
-templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
 @router.post("/analyze")
@@ -1,67 +1,142 @@
 # routers/transaction.py
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, Request, Form
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
+from app.templating import templates
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select, true, tuple_, update
 from uuid import uuid4
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from datetime import datetime
+from typing import Optional
 from app.models.constant import IST
-import json
-import random
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import asyncio
+import secrets
+import string
+from email.message import EmailMessage
 from app.schemas.transaction import TransactionInput, FraudPredictionResponse
 from app.models.transaction import Transaction
 from app.models.profile import Profile
-from app.models.user import User
-from app.database import get_db
+from app.database import get_async_db, SessionLocal
 from app.services.fraud_service import run_fraud_pipeline
 from app.services.device_service import calculate_derived_columns
-from app.routers.auth import get_current_user
+from app.services.time_features import IS_NIGHT_BY_HOUR
+from app.services import email_outbox, otp_store, pending_txn_store
+from app.routers.auth import get_current_user_async
 from app.config import settings
 
 router = APIRouter(prefix="/transaction", tags=["Transaction"])
-templates = Jinja2Templates(directory="app/templates")
 
-# Store OTP temporarily (in production, use Redis or database)
-otp_store = {}
+TRANSACTIONS_PAGE_SIZE = 50
+
+# Signed cookie pointing the step-up page at its pending transaction
+STEP_UP_COOKIE = "step_up_txn"
+_step_up_signer = URLSafeTimedSerializer(settings.SECRET_KEY, salt="step-up-txn")
+
+# OTP email body and headers are built once; only the code is substituted per send
+_OTP_HTML = """\
+<html>
+  <body style="font-family: Arial, sans-serif; color: #333;">
+    <p>Your OTP for CipherStorm transaction verification is:</p>
+    <p style="font-size: 24px; font-weight: bold; letter-spacing: 4px;">$otp</p>
+    <p>This OTP will expire in 10 minutes.<br>
+    If you did not request this OTP, please ignore this email.</p>
+    <p>Best regards,<br>CipherStorm Security Team</p>
+  </body>
+</html>
+"""
+_OTP_TEMPLATE = string.Template(_OTP_HTML)
+_OTP_HEADERS = {
+    "From": settings.SMTP_EMAIL,
+    "Subject": "CipherStorm - Transaction Verification OTP",
+}
+
+def _transaction_context_query(user_id: int):
+    """Profile and last transaction location for a user in a single statement"""
+    last_txn = (
+        select(Transaction.latitude, Transaction.longitude)
+        .where(Transaction.user_id == user_id)
+        .order_by(Transaction.created_at.desc())
+        .limit(1)
+        .subquery()
+    )
+    return (
+        select(Profile, last_txn.c.latitude, last_txn.c.longitude)
+        .outerjoin(last_txn, true())
+        .where(Profile.user_id == user_id)
+    )
+
+def _increment_txn_count(user_id: int):
+    """Statement bumping the profile's transaction counter alongside a saved transaction"""
+    return (
+        update(Profile)
+        .where(Profile.user_id == user_id)
+        .values(txn_count=Profile.txn_count + 1)
+    )
+
+async def _load_user_context(db: AsyncSession, user_id: int):
+    # Runs on the request's session: it is the only DB call in flight next to the ipapi.co lookup
+    row = (await db.execute(_transaction_context_query(user_id))).one_or_none()
+
+    if row is None:
+        return None, None, 0
+
+    profile, latitude, longitude = row
+    last_transaction_location = None
+    if latitude and longitude:
+        last_transaction_location = {
+            'latitude': float(latitude),
+            'longitude': float(longitude)
+        }
+    return profile, last_transaction_location, profile.txn_count
+
+async def _load_transaction_context(request: Request, db: AsyncSession, user_id: int):
+    """Fetch profile, last location, transaction count and derived columns concurrently"""
+    (profile, last_transaction_location, txn_count), derived_data = await asyncio.gather(
+        _load_user_context(db, user_id),
+        calculate_derived_columns(request),
+    )
+    return profile, last_transaction_location, txn_count, derived_data
+
+def _run_fraud_pipeline_sync(transaction_obj, profile_obj, txn_count, last_transaction_location):
+    """The pipeline uses the sync ORM and blocking HTTP, so it runs in the threadpool with its own session.
+
+    Callers must not hold a sync connection themselves: the transaction routes only use the async
+    pool, so this is the one sync connection the request takes and it cannot wait on itself.
+    """
+    with SessionLocal() as session:
+        return run_fraud_pipeline(
+            transaction_obj,
+            profile_obj,
+            txn_count=txn_count,
+            last_transaction_location=last_transaction_location,
+            db_session=session
+        )
 
 @router.post("/", response_model=FraudPredictionResponse)
-def create_and_predict_transaction(
+async def create_and_predict_transaction(
     request: Request,
     amount: float = Form(...),
     transaction_type: str = Form(...),
     payment_method: str = Form(...),
     recipient_upi_id: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
 ):
-    profile = db.query(Profile).filter(Profile.user_id == current_user.user_id).first()
+    # Profile, last location, past count and derived columns (device_id, location from IP) in parallel
+    profile, last_transaction_location, txn_count, derived_data = await _load_transaction_context(
+        request, db, current_user.user_id
+    )
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
 
     # Generate timestamp features
     now = datetime.now(IST)
-    is_night = now.hour < 6 or now.hour > 22
+    hour, minute, day_of_week = now.hour, now.minute, now.weekday()
+    is_night = IS_NIGHT_BY_HOUR[hour]
 
-    # Calculate derived columns internally (device_id from cookie/header, location from IP)
-    derived_data = calculate_derived_columns(request)
-
-    # Get last transaction for distance calculation
-    last_txn = db.query(Transaction).filter(
-        Transaction.user_id == current_user.user_id
-    ).order_by(Transaction.created_at.desc()).first()
-
-    last_transaction_location = None
-    if last_txn and last_txn.latitude and last_txn.longitude:
-        last_transaction_location = {
-            'latitude': float(last_txn.latitude),
-            'longitude': float(last_txn.longitude)
-        }
-
-    # Save transaction
+    # Build the transaction in memory; it is saved once the verdict is known
     txn_id = str(uuid4())
     new_txn = Transaction(
         transaction_id=txn_id,
@@ -78,87 +153,77 @@ def create_and_predict_transaction(
         longitude=derived_data["longitude"],
         country=derived_data["country"],
         city=derived_data["city"],
-        day_of_week=now.weekday(),
-        hour=now.hour,
-        minute=now.minute,
+        day_of_week=day_of_week,
+        hour=hour,
+        minute=minute,
         is_night=is_night,
         created_at=now
     )
-    db.add(new_txn)
-    db.commit()
-    db.refresh(new_txn)
-
-    # Get count of past transactions for the user
-    txn_count = db.query(Transaction).filter(Transaction.user_id == current_user.user_id).count()
-
-    # Use model
-    result = run_fraud_pipeline(
-        new_txn, 
-        profile, 
-        txn_count=txn_count, 
-        last_transaction_location=last_transaction_location,
-        db_session=db
+
+    # Use model (count includes the transaction being saved)
+    result = await run_in_threadpool(
+        _run_fraud_pipeline_sync,
+        new_txn,
+        profile,
+        txn_count + 1,
+        last_transaction_location
     )
 
+    # Save transaction and bump the counter in a single commit
     new_txn.is_fraud = bool(result["final_prediction"])
-    db.commit()
+    db.add(new_txn)
+    await db.execute(_increment_txn_count(current_user.user_id))
+    await db.commit()
 
     # Routing logic based on fraud detection results
     if new_txn.is_fraud:
-        # Step-up authentication: Send OTP
-        otp = random.randint(100000, 999999)
-        otp_store[profile.upi_id] = otp  # Store OTP
-        
-        # Send OTP via email (assuming user's email is available in profile)
-        msg = MIMEMultipart()
-        msg['From'] = settings.EMAIL_FROM
-        msg['To'] = profile.email
-        msg['Subject'] = 'Your OTP Code'
-        body = f"Your OTP code is {otp}. It is valid for 10 minutes."
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.EMAIL_FROM, settings.EMAIL_PASSWORD)
-            server.send_message(msg)
-        
-        return {"detail": "Fraud detected. OTP sent to registered email."}
+        # Step-up authentication: the OTP is stored and emailed after the response goes out
+        otp = str(secrets.randbelow(900000) + 100000)
+        return ORJSONResponse(
+            {"detail": "Fraud detected. OTP sent to registered email."},
+            background=BackgroundTask(_finalize_fraud_case, profile.upi_id, current_user.email, otp)
+        )
     
     return result
 
 @router.post("/verify_otp")
-def verify_otp(
+async def verify_otp(
     request: Request,
     otp: int = Form(...),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
 ):
-    profile = db.query(Profile).filter(Profile.user_id == current_user.user_id).first()
+    profile = (await db.execute(
+        select(Profile).where(Profile.user_id == current_user.user_id)
+    )).scalars().first()
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
     
-    # Verify OTP
-    stored_otp = otp_store.get(profile.upi_id)
-    if not stored_otp or stored_otp != otp:
+    # Verify OTP (consumed from the store on success)
+    if not await otp_store.verify_otp(profile.upi_id, otp):
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
-    
-    # OTP verified, remove from store
-    del otp_store[profile.upi_id]
 
     return {"detail": "OTP verified successfully. Transaction approved."}
 
 @router.delete("/{txn_id}")
-def delete_transaction(
+async def delete_transaction(
     txn_id: str, 
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
 ):
-    txn = db.query(Transaction).get(txn_id)
-    if not txn:
+    # Only the owner's transaction matches; no SELECT before the DELETE
+    result = await db.execute(
+        delete(Transaction)
+        .where(Transaction.transaction_id == txn_id, Transaction.user_id == current_user.user_id)
+    )
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    db.delete(txn)
-    db.commit()
+    await db.execute(
+        update(Profile)
+        .where(Profile.user_id == current_user.user_id)
+        .values(txn_count=Profile.txn_count - 1)
+    )
+    await db.commit()
     return {"msg": "Transaction deleted"}
 
 @router.post("/process", response_class=HTMLResponse)
@@ -168,35 +233,23 @@ async def process_transaction(
     transaction_type: str = Form(...),
     payment_method: str = Form(...),
     recipient_upi_id: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
 ):
     """Process transaction and route based on fraud detection results"""
     try:
-        profile = db.query(Profile).filter(Profile.user_id == current_user.user_id).first()
-        user = db.query(User).filter(User.user_id == current_user.user_id).first()
+        # Profile, last location, past count and derived columns in parallel
+        profile, last_transaction_location, txn_count, derived_data = await _load_transaction_context(
+            request, db, current_user.user_id
+        )
         
         if not profile:
             raise HTTPException(status_code=404, detail="User profile not found")
 
         # Generate timestamp features
-        now = datetime.now()
-        is_night = now.hour < 6 or now.hour > 22
-
-        # Calculate derived columns
-        derived_data = calculate_derived_columns(request)
-
-        # Get last transaction for distance calculation
-        last_txn = db.query(Transaction).filter(
-            Transaction.user_id == current_user.user_id
-        ).order_by(Transaction.created_at.desc()).first()
-
-        last_transaction_location = None
-        if last_txn and last_txn.latitude and last_txn.longitude:
-            last_transaction_location = {
-                'latitude': float(last_txn.latitude),
-                'longitude': float(last_txn.longitude)
-            }
+        now = datetime.now(IST)
+        hour, minute, day_of_week = now.hour, now.minute, now.weekday()
+        is_night = IS_NIGHT_BY_HOUR[hour]
 
         # Create transaction object for fraud detection (don't save yet)
         txn_id = str(uuid4())
@@ -215,23 +268,20 @@ async def process_transaction(
             longitude=derived_data["longitude"],
             country=derived_data["country"],
             city=derived_data["city"],
-            day_of_week=now.weekday(),
-            hour=now.hour,
-            minute=now.minute,
+            day_of_week=day_of_week,
+            hour=hour,
+            minute=minute,
             is_night=is_night,
             created_at=now
         )
 
-        # Get count of past transactions for the user
-        txn_count = db.query(Transaction).filter(Transaction.user_id == current_user.user_id).count()
-
         # Run fraud detection
-        fraud_result = run_fraud_pipeline(
-            temp_txn, 
-            profile, 
-            txn_count=txn_count, 
-            last_transaction_location=last_transaction_location,
-            db_session=db
+        fraud_result = await run_in_threadpool(
+            _run_fraud_pipeline_sync,
+            temp_txn,
+            profile,
+            txn_count,
+            last_transaction_location
         )
 
         # Prepare transaction data for templates
@@ -245,40 +295,49 @@ async def process_transaction(
             "from_account": profile.upi_id
         }
 
-        # Save transaction data in session if fraud is detected
+        # Hold the transaction server-side if fraud is detected
         if fraud_result["final_prediction"] == 1:  # Fraud detected
-            # Store transaction data in session for step-up auth
-            transaction_json = json.dumps({
-                **transaction_data,
-                "temp_txn_data": {
+            # Don't save transaction yet, wait for verification
+            await pending_txn_store.save_pending(txn_id, {
+                "user_id": current_user.user_id,
+                "transaction": {
                     "amount": amount,
                     "transaction_type": transaction_type,
-                    "payment_method": payment_method,
-                    "recipient_upi_id": recipient_upi_id,
-                    "derived_data": derived_data,
-                    "txn_count": txn_count,
-                    "last_transaction_location": last_transaction_location
-                }
+                    "payment_instrument": payment_method,
+                    "payer_vpa": profile.upi_id,
+                    "beneficiary_vpa": recipient_upi_id,
+                    "initiation_mode": derived_data["initiation_mode"],
+                    "device_id": derived_data["device_id"],
+                    "ip_address": derived_data["ip_address"],
+                    "latitude": derived_data["latitude"],
+                    "longitude": derived_data["longitude"],
+                    "country": derived_data["country"],
+                    "city": derived_data["city"],
+                    "day_of_week": day_of_week,
+                    "hour": hour,
+                    "minute": minute,
+                    "is_night": is_night,
+                    "created_at": now.isoformat()
+                },
+                "transaction_data": transaction_data,
+                "fraud_report": fraud_result
             })
-            
-            # Don't save transaction yet, wait for verification
-            return templates.TemplateResponse(
-                "transaction_results.html",
-                {
-                    "request": request,
-                    "user": current_user,
-                    "transaction_data": transaction_data,
-                    "fraud_report": fraud_result,
-                    "requires_verification": True,
-                    "transaction_json": transaction_json
-                }
+
+            response = RedirectResponse(url="/transaction/auth/step-up", status_code=303)
+            response.set_cookie(
+                STEP_UP_COOKIE,
+                _step_up_signer.dumps(txn_id),
+                max_age=pending_txn_store.PENDING_TTL_SECONDS,
+                httponly=True,
+                samesite="lax"
             )
+            return response
         else:  # No fraud detected
             # Save the transaction
             db.add(temp_txn)
             temp_txn.is_fraud = False
-            db.commit()
-            db.refresh(temp_txn)
+            await db.execute(_increment_txn_count(current_user.user_id))
+            await db.commit()
             
             return templates.TemplateResponse(
                 "transaction_results.html",
@@ -294,287 +353,163 @@ async def process_transaction(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transaction processing failed: {str(e)}")
 
-@router.post("/auth/step-up-verify", response_class=HTMLResponse)
-async def step_up_verify(
+async def _load_step_up_transaction(step_up_txn: str, user_id: int):
+    """Resolve the signed step-up cookie to its pending transaction, if it is still valid"""
+    if not step_up_txn:
+        return None, None
+    try:
+        txn_id = _step_up_signer.loads(step_up_txn, max_age=pending_txn_store.PENDING_TTL_SECONDS)
+    except BadSignature:
+        return None, None
+
+    pending = await pending_txn_store.get_pending(txn_id)
+    if not pending or pending["user_id"] != user_id:
+        return None, None
+    return txn_id, pending
+
+@router.get("/auth/step-up", response_class=HTMLResponse)
+async def step_up(
     request: Request,
+    step_up_txn: str = Cookie(default=None),
+    current_user: dict = Depends(get_current_user_async)
+):
+    """Render step-up verification for the pending suspicious transaction"""
+    txn_id, pending = await _load_step_up_transaction(step_up_txn, current_user.user_id)
+    if not pending:
+        return RedirectResponse(url="/services/make-transaction", status_code=303)
+
+    return templates.TemplateResponse(
+        "step_up.html",
+        {
+            "request": request,
+            "user": current_user,
+            "user_email": current_user.email,
+            "transaction_data": pending["transaction_data"],
+            "fraud_details": pending["fraud_report"]
+        }
+    )
+
+@router.post("/auth/step-up-verify")
+async def step_up_verify(
     action: str = Form(...),
-    email: str = Form(None),
     otp: str = Form(None),
-    transaction_data: str = Form(None),
-    smtp_server: str = Form(None),
-    smtp_port: str = Form(None),
-    smtp_email: str = Form(None),
-    smtp_password: str = Form(None),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    step_up_txn: str = Cookie(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
 ):
-    """Handle step-up authentication for suspicious transactions"""
-    try:
-        # Prepare SMTP settings from form data
-        smtp_settings = {
-            'smtp_server': smtp_server,
-            'smtp_port': smtp_port,
-            'smtp_email': smtp_email,
-            'smtp_password': smtp_password
-        } if all([smtp_server, smtp_port, smtp_email, smtp_password]) else None
-
-        if action == "send_otp":
-            # Generate and send OTP
-            otp_code = str(random.randint(100000, 999999))
-            otp_store[email] = otp_code
-            
-            # Send OTP email using provided SMTP settings
-            success = send_otp_email(email, otp_code, smtp_settings)
-            
-            if success:
-                return templates.TemplateResponse(
-                    "step_up.html",
-                    {
-                        "request": request,
-                        "user": current_user,
-                        "otp_sent": True,
-                        "user_email": email,
-                        "transaction_data": transaction_data,
-                        "success": "OTP sent successfully to your email!"
-                    }
-                )
-            else:
-                return templates.TemplateResponse(
-                    "step_up.html",
-                    {
-                        "request": request,
-                        "user": current_user,
-                        "user_email": email,
-                        "transaction_data": transaction_data,
-                        "error": "Failed to send OTP. Please try again."
-                    }
-                )
-                
-        elif action == "verify_otp":
-            # Verify OTP and process transaction
-            if email in otp_store and otp_store[email] == otp:
-                # OTP verified successfully, save the suspicious transaction
-                del otp_store[email]  # Remove used OTP
-                
-                try:
-                    # Parse the transaction data from the form - handle both string and dict formats
-                    if isinstance(transaction_data, str):
-                        try:
-                            txn_data = json.loads(transaction_data)
-                        except json.JSONDecodeError:
-                            # Try to evaluate as a string representation of a dict
-                            try:
-                                txn_data = eval(transaction_data)
-                            except:
-                                txn_data = {"data": transaction_data}
-                    else:
-                        txn_data = transaction_data
-                    
-                    # Handle case where transaction data might be nested
-                    if isinstance(txn_data, str):
-                        try:
-                            txn_data = json.loads(txn_data)
-                        except json.JSONDecodeError:
-                            try:
-                                txn_data = eval(txn_data)
-                            except:
-                                txn_data = {"data": txn_data}
-                    
-                    # Extract temp_data, handling both possible structures
-                    if "temp_txn_data" in txn_data:
-                        temp_data = txn_data["temp_txn_data"]
-                    else:
-                        temp_data = txn_data
-
-                    # Get profile for the current user to use as fallback
-                    profile = db.query(Profile).filter(Profile.user_id == current_user.user_id).first()
-                    # Get transaction ID or generate new one
-                    txn_id = txn_data.get("transaction_id") or str(uuid4())
-                    
-                    # Create transaction with careful data handling
-                    transaction = Transaction(
-                        user_id=current_user.user_id,
-                        transaction_id=txn_id,
-                        amount=float(temp_data.get("amount", 0)),
-                        transaction_type=temp_data.get("transaction_type", "unknown"),
-                        payment_instrument=temp_data.get("payment_method", "unknown"),
-                        payer_vpa=profile.upi_id if profile else "",
-                        beneficiary_vpa=temp_data.get("recipient_upi_id", ""),
-                        is_fraud=True,  # Mark as suspicious but verified
-                        created_at=datetime.now(IST),
-                        # Add derived data if available
-                        device_id=temp_data.get("derived_data", {}).get("device_id", "unknown"),
-                        ip_address=temp_data.get("derived_data", {}).get("ip_address", "unknown"),
-                        latitude=temp_data.get("derived_data", {}).get("latitude", 0.0),
-                        longitude=temp_data.get("derived_data", {}).get("longitude", 0.0),
-                        country=temp_data.get("derived_data", {}).get("country", "unknown"),
-                        city=temp_data.get("derived_data", {}).get("city", "unknown")
-                    )
-                
-                    db.add(transaction)
-                    db.commit()
-                    
-                    # Redirect to identity verified success page
-                    return templates.TemplateResponse(
-                        "identity_verified.html",
-                        {
-                            "request": request,
-                            "user": current_user
-                        }
-                    )
-                except Exception as e:
-                    print(f"Error processing transaction data: {str(e)}")
-                    print(f"Transaction data: {transaction_data}")
-                    return templates.TemplateResponse(
-                        "step_up.html",
-                        {
-                            "request": request,
-                            "user": current_user,
-                            "otp_sent": True,
-                            "user_email": email,
-                            "transaction_data": transaction_data,
-                            "error": f"Failed to process transaction: {str(e)}"
-                        }
-                    )
-                
-                db.add(transaction)
-                db.commit()
-                
-                # Redirect to identity verified success page
-                return templates.TemplateResponse(
-                    "identity_verified.html",
-                    {
-                        "request": request,
-                        "user": current_user
-                    }
-                )
-            else:
-                return templates.TemplateResponse(
-                    "step_up.html",
-                    {
-                        "request": request,
-                        "user": current_user,
-                        "otp_sent": True,
-                        "user_email": email,
-                        "transaction_data": transaction_data,
-                        "error": "Invalid OTP. Please try again."
-                    }
-                )
-                
-        elif action == "resend_otp":
-            # Resend OTP
-            otp_code = str(random.randint(100000, 999999))
-            otp_store[email] = otp_code
-            
-            # Send OTP email using provided SMTP settings
-            success = send_otp_email(email, otp_code, smtp_settings)
-            
-            return templates.TemplateResponse(
-                "step_up.html",
-                {
-                    "request": request,
-                    "user": current_user,
-                    "otp_sent": True,
-                    "user_email": email,
-                    "transaction_data": transaction_data,
-                    "success": "OTP resent successfully!" if success else "Failed to resend OTP."
-                }
-            )
-            
-    except Exception as e:            # Log the error details for debugging
-            print(f"Error in step_up_verify: {str(e)}")
-            print(f"Transaction data type: {type(transaction_data)}")
-            print(f"Transaction data content: {transaction_data}")
-            
-            return templates.TemplateResponse(
-                "step_up.html",
-                {
-                    "request": request,
-                    "user": current_user,
-                    "user_email": email,
-                    "transaction_data": transaction_data,
-                    "error": f"An error occurred: {str(e)}"
-                }
-            )
+    """Handle OTP send/resend/verify for suspicious transactions; the page calls this with fetch()"""
+    txn_id, pending = await _load_step_up_transaction(step_up_txn, current_user.user_id)
+    if not pending:
+        return ORJSONResponse({"error": "Verification session expired. Please start the transaction again."}, status_code=400)
 
-@router.post("/auth/step-up")
-async def step_up(
+    email = current_user.email
+
+    if action in ("send_otp", "resend_otp"):
+        otp_code = str(secrets.randbelow(900000) + 100000)
+        message = "OTP sent successfully to your email!" if action == "send_otp" else "OTP resent successfully!"
+        return ORJSONResponse(
+            {"ok": True, "message": message},
+            background=BackgroundTask(_finalize_fraud_case, email, email, otp_code)
+        )
+
+    if action == "verify_otp":
+        if not await otp_store.verify_otp(email, otp):
+            return ORJSONResponse({"error": "Invalid OTP. Please try again."}, status_code=400)
+
+        # OTP verified (and consumed); take the pending transaction so it is saved once
+        pending = await pending_txn_store.pop_pending(txn_id)
+        if not pending:
+            return ORJSONResponse({"error": "Transaction was already processed."}, status_code=400)
+
+        fields = pending["transaction"]
+        transaction = Transaction(
+            **{**fields, "created_at": datetime.fromisoformat(fields["created_at"])},
+            transaction_id=txn_id,
+            user_id=current_user.user_id,
+            is_fraud=True  # Mark as suspicious but verified
+        )
+        db.add(transaction)
+        await db.execute(_increment_txn_count(current_user.user_id))
+        await db.commit()
+
+        response = ORJSONResponse({"ok": True, "redirect": "/transaction/auth/step-up/verified"})
+        response.delete_cookie(STEP_UP_COOKIE)
+        return response
+
+    return ORJSONResponse({"error": f"Unknown action: {action}"}, status_code=400)
+
+@router.get("/auth/step-up/verified", response_class=HTMLResponse)
+async def step_up_verified(
     request: Request,
-    transaction_data: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_async)
 ):
-    """Handle step-up verification initiation"""
+    return templates.TemplateResponse(
+        "identity_verified.html",
+        {
+            "request": request,
+            "user": current_user
+        }
+    )
+
+def _parse_transactions_cursor(cursor: str):
+    """Split a "<created_at iso>|<transaction_id>" cursor into its keyset values"""
     try:
-        # Keep transaction_data as string, don't parse it here
-        user = db.query(User).filter(User.user_id == current_user.user_id).first()
-        
-        return templates.TemplateResponse(
-            "step_up.html", 
-            {
-                "request": request,
-                "user": current_user,
-                "transaction_data": transaction_data,  # Pass as is
-                "user_email": user.email if user else None
-            }
-        )
-    except Exception as e:
-        print(f"Error in step_up: {str(e)}")
-        print(f"Transaction data type: {type(transaction_data)}")
-        print(f"Transaction data content: {transaction_data}")
-        raise HTTPException(status_code=500, detail=f"Step-up verification failed: {str(e)}")
+        created_at, txn_id = cursor.split("|", 1)
+        return datetime.fromisoformat(created_at), txn_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/transactions", response_class=HTMLResponse)
-async def view_transactions(request: Request, db: Session = Depends(get_db)):
-    user = get_current_user(request)
-    if not user:
-        return RedirectResponse(url="/auth/login")
-    
-    # Get all transactions for the current user, ordered by most recent first
-    transactions = (db.query(Transaction)
-                   .filter(Transaction.user_id == user.user_id)
-                   .order_by(desc(Transaction.created_at))
-                   .all())
+async def view_transactions(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(TRANSACTIONS_PAGE_SIZE, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user_async)
+):
+    """One page of the user's transactions, most recent first, continuing after `cursor`"""
+    query = select(Transaction).where(Transaction.user_id == current_user.user_id)
+    if cursor:
+        # Keyed on (created_at, transaction_id) so rows sharing a timestamp aren't skipped
+        cursor_created_at, cursor_txn_id = _parse_transactions_cursor(cursor)
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.transaction_id)
+            < tuple_(cursor_created_at, cursor_txn_id)
+        )
+    # One extra row tells us whether there is another page
+    query = query.order_by(
+        Transaction.created_at.desc(), Transaction.transaction_id.desc()
+    ).limit(limit + 1)
+
+    transactions = (await db.execute(query)).scalars().all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = f"{last.created_at.isoformat()}|{last.transaction_id}"
     
     return templates.TemplateResponse(
         "dashboard.html",
         {
             "request": request,
-            "user": user,
-            "transactions": transactions
+            "user": current_user,
+            "transactions": transactions,
+            "next_cursor": next_cursor,
+            "limit": limit
         }
     )
 
-def send_otp_email(to_email: str, otp_code: str, smtp_settings: dict = None) -> bool:
-    """Send OTP email using provided SMTP settings or default settings"""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_settings.get('smtp_email') if smtp_settings else settings.SMTP_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = 'Your CipherStorm Transaction OTP'
-        
-        body = f"""
-        Your OTP for CipherStorm transaction verification is: {otp_code}
-        
-        This OTP will expire in 10 minutes.
-        If you did not request this OTP, please ignore this email.
-        
-        Best regards,
-        CipherStorm Security Team
-        """
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Use provided SMTP settings or fall back to default settings
-        smtp_server = smtp_settings.get('smtp_server', 'smtp.gmail.com')
-        smtp_port = int(smtp_settings.get('smtp_port', 587))
-        smtp_email = smtp_settings.get('smtp_email', settings.SMTP_EMAIL)
-        smtp_password = smtp_settings.get('smtp_password', settings.SMTP_PASSWORD)
-        
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_email, smtp_password)
-            server.send_message(msg)
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
-        return False
\ No newline at end of file
+async def send_otp_email(to_email: str, otp_code: str):
+    """Queue the OTP email; the outbox sends it with the next SMTP batch"""
+    msg = EmailMessage()
+    for header, value in _OTP_HEADERS.items():
+        msg[header] = value
+    msg['To'] = to_email
+    msg.set_content(_OTP_TEMPLATE.substitute(otp=otp_code), subtype="html")
+    await email_outbox.enqueue(msg)
+
+async def _finalize_fraud_case(otp_key: str, to_email: str, otp_code: str):
+    """Store the OTP, then queue its email; runs as a response background task"""
+    # Stored first so the code is always verifiable by the time the email can arrive
+    await otp_store.set_otp(otp_key, otp_code)
+    await send_otp_email(to_email, otp_code)
@@ -2,7 +2,7 @@
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 import logging
 from app.models.url import URLScan
@@ -15,10 +15,6 @@ from datetime import datetime
 from app.models.constant import IST
 
 router = APIRouter(prefix="/url", tags=["URL"])
-# Use absolute path for templates
-import os
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
 from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 from typing import Optional, List
 import tempfile
@@ -23,7 +23,6 @@ from routers.auth import get_current_user
 from services.vishing_service import vishing_service
 
 router = APIRouter(prefix="/vishing", tags=["Vishing Detection"])
-templates = Jinja2Templates(directory="app/templates")
 
 UPLOAD_DIR = "uploaded_audio"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
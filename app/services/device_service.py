@@ -1,5 +1,8 @@
-import requests
+import httpx
+import asyncio
 import uuid
+import ipaddress
+from cachetools import TTLCache
 from typing import Dict, Optional, Tuple
 import logging
 
@@ -7,42 +10,103 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_ip_and_location_data() -> Tuple[str, Dict[str, Optional[str]]]:
+# ipapi.co lookups cached per client IP for an hour
+_location_cache = TTLCache(maxsize=10_000, ttl=3600)
+
+# In-flight ipapi.co lookups keyed by client IP
+_inflight_lookups: Dict[str, "asyncio.Future"] = {}
+
+# (connect, read) seconds, kept short so a slow ipapi.co can't tie up workers
+IPAPI_TIMEOUT = (1.0, 3.0)
+
+# Shared client so keep-alive connections to ipapi.co are reused. The pool limits live on the
+# transport because httpx ignores client-level limits once a transport is given.
+_http_client = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        retries=2,  # connection failures only
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    ),
+    timeout=httpx.Timeout(IPAPI_TIMEOUT[1], connect=IPAPI_TIMEOUT[0]),
+)
+
+def _unknown_location() -> Tuple[str, Dict[str, Optional[str]]]:
+    return "127.0.0.1", {
+        "country": "Unknown",
+        "city": "Unknown",
+        "latitude": None,
+        "longitude": None
+    }
+
+def _ipapi_url(client_ip: str) -> str:
+    """Look up the client's own IP when it is public, else let ipapi.co use the caller's"""
+    try:
+        if ipaddress.ip_address(client_ip).is_global:
+            return f"https://ipapi.co/{client_ip}/json/"
+    except ValueError:
+        pass
+    return "https://ipapi.co/json/"
+
+def _parse_ipapi_response(data: Dict) -> Tuple[str, Dict[str, Optional[str]]]:
+    ip_address = data.get("ip", "127.0.0.1")
+    location_data = {
+        "country": data.get("country_name", "Unknown"),
+        "city": data.get("city", "Unknown"),
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude")
+    }
+    
+    logger.info(f"Successfully retrieved location data: IP={ip_address}, Country={location_data['country']}")
+    return ip_address, location_data
+
+async def fetch_ip_and_location_data(client_ip: str) -> Tuple[str, Dict[str, Optional[str]]]:
     """
     Get both IP address and location data in a single API call to ipapi.co
     """
     try:
-        response = requests.get("https://ipapi.co/json/", timeout=5)
+        response = await _http_client.get(_ipapi_url(client_ip))
         response.raise_for_status()
-        data = response.json()
-        
-        ip_address = data.get("ip", "127.0.0.1")
-        location_data = {
-            "country": data.get("country_name", "Unknown"),
-            "city": data.get("city", "Unknown"),
-            "latitude": data.get("latitude"),
-            "longitude": data.get("longitude")
-        }
-        
-        logger.info(f"Successfully retrieved location data: IP={ip_address}, Country={location_data['country']}")
-        return ip_address, location_data
+        return _parse_ipapi_response(response.json())
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching data from ipapi.co: {e}")
-        return "127.0.0.1", {
-            "country": "Unknown",
-            "city": "Unknown",
-            "latitude": None,
-            "longitude": None
-        }
+        return _unknown_location()
     except Exception as e:
         logger.error(f"Unexpected error getting IP and location data: {e}")
-        return "127.0.0.1", {
-            "country": "Unknown",
-            "city": "Unknown",
-            "latitude": None,
-            "longitude": None
-        }
+        return _unknown_location()
+
+async def _fill_location_cache(client_ip: str) -> Tuple[str, Dict[str, Optional[str]]]:
+    result = await fetch_ip_and_location_data(client_ip)
+    # Don't pin the fallback value for an hour when ipapi.co is failing
+    if result[1]["country"] != "Unknown":
+        _location_cache[client_ip] = result
+    return result
+
+async def get_ip_and_location_data(client_ip: str) -> Tuple[str, Dict[str, Optional[str]]]:
+    """
+    Get IP address and location data for a client IP, served from the TTL cache when possible
+    """
+    cached = _location_cache.get(client_ip)
+    if cached is not None:
+        return cached
+
+    # Concurrent misses for the same IP share one lookup; other IPs don't wait on it
+    lookup = _inflight_lookups.get(client_ip)
+    if lookup is None:
+        lookup = _inflight_lookups[client_ip] = asyncio.ensure_future(_fill_location_cache(client_ip))
+        lookup.add_done_callback(lambda _: _inflight_lookups.pop(client_ip, None))
+
+    # Shielded so one cancelled request doesn't cancel the lookup for the others
+    return await asyncio.shield(lookup)
+
+async def close_http_client():
+    await _http_client.aclose()
+
+def get_client_ip(request) -> str:
+    """
+    Extract the client IP from the connection. X-Forwarded-For is client-controlled,
+    so behind a proxy let uvicorn rewrite the peer (--proxy-headers --forwarded-allow-ips)
+    """
+    return request.client.host if request.client else "127.0.0.1"
 
 def get_device_id_from_request(request) -> str:
     """
@@ -63,15 +127,15 @@ def get_device_id_from_request(request) -> str:
     
     return device_id
 
-def calculate_derived_columns(request) -> Dict:
+async def calculate_derived_columns(request) -> Dict:
     """
     Calculate all derived columns for a transaction
     """
     # Get device ID from request (generated on frontend)
     device_id = get_device_id_from_request(request)
     
-    # Get IP and location data in a single call
-    ip_address, location_data = get_ip_and_location_data()
+    # Get IP and location data in a single call (cached per client IP)
+    ip_address, location_data = await get_ip_and_location_data(get_client_ip(request))
     
     return {
         "device_id": device_id,
@@ -81,4 +145,4 @@ def calculate_derived_columns(request) -> Dict:
         "latitude": location_data["latitude"],
         "longitude": location_data["longitude"],
         "initiation_mode": "Default"  # Always set to Default as requested
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,106 @@
+# services/email_outbox.py
+import asyncio
+import logging
+import smtplib
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+
+from app.services.smtp_pool import get_smtp
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A batch is flushed when it reaches this size or this age, whichever comes first
+MAX_BATCH = 32
+MAX_WAIT_SECONDS = 0.05
+OUTBOX_SIZE = 1000
+
+# Queued behind the pending mail on shutdown so the drainer finishes its current batch first
+_STOP = object()
+
+_outbox: Optional["asyncio.Queue[EmailMessage]"] = None
+_drainer_task: Optional[asyncio.Task] = None
+
+
+def _send_message(server, msg: EmailMessage, reset: bool):
+    try:
+        if reset:
+            server.rset()
+        server.send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+        # Pooled session was dropped by the server mid-batch
+        server.reconnect()
+        server.send_message(msg)
+
+
+def _send_batch(batch: List[EmailMessage]):
+    """Send every message over one pooled SMTP session, resetting the envelope between them"""
+    try:
+        with get_smtp() as server:
+            for i, msg in enumerate(batch):
+                # One bad message (or a failed reconnect) must not drop the rest of the batch
+                try:
+                    _send_message(server, msg, reset=i > 0)
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.error(f"Failed to send email to {msg['To']}: {e}")
+    except Exception as e:
+        logger.error(f"Failed to send batch of {len(batch)} emails: {e}")
+
+
+async def _collect_batch(first: EmailMessage) -> Tuple[List[EmailMessage], bool]:
+    """Gather a batch starting with first; the flag is set when the stop sentinel was reached"""
+    batch = [first]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_WAIT_SECONDS
+    while len(batch) < MAX_BATCH:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            msg = await asyncio.wait_for(_outbox.get(), timeout)
+        except asyncio.TimeoutError:
+            break
+        if msg is _STOP:
+            return batch, True
+        batch.append(msg)
+    return batch, False
+
+
+async def _smtp_drainer():
+    while True:
+        first = await _outbox.get()
+        if first is _STOP:
+            return
+        batch, stopping = await _collect_batch(first)
+        # smtplib is blocking, keep it off the event loop
+        await asyncio.to_thread(_send_batch, batch)
+        if stopping:
+            return
+
+
+async def enqueue(msg: EmailMessage):
+    """Queue a message for the next batch; returns as soon as it is queued"""
+    await _outbox.put(msg)
+
+
+def start():
+    """Create the outbox and start draining it (called on application startup)"""
+    global _outbox, _drainer_task
+    _outbox = asyncio.Queue(maxsize=OUTBOX_SIZE)
+    _drainer_task = asyncio.create_task(_smtp_drainer())
+
+
+async def stop():
+    """Let the drainer finish its current batch, then flush whatever is still queued (called on application shutdown)"""
+    if _drainer_task is None:
+        return
+    await _outbox.put(_STOP)
+    await _drainer_task
+
+    # Anything queued behind the sentinel while the last batch was sending
+    pending = []
+    while not _outbox.empty():
+        pending.append(_outbox.get_nowait())
+    for i in range(0, len(pending), MAX_BATCH):
+        await asyncio.to_thread(_send_batch, pending[i:i + MAX_BATCH])
@@ -3,13 +3,17 @@ import pickle
 import numpy as np
 import math
 import os
+from numba import njit
 from datetime import datetime, timedelta
 from collections import defaultdict
 from sqlalchemy import func
 import logging
 import jwt
 import time
+import threading
 import requests
+from app.services.inference_batcher import InferenceBatcher
+from app.services.time_features import TIME_FEATURES, time_feature_row
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -40,6 +44,16 @@ except FileNotFoundError:
     logger.error("Global frequency encoders file not found")
     global_freq_encoders = {}
 
+# The global model's time features come straight from TIME_FEATURE_TABLE, skipping
+# encode_categorical_features; that is only equivalent while no encoder covers them
+_encoded_time_features = set(TIME_FEATURES) & (set(global_label_encoders) | set(global_freq_encoders))
+USE_TIME_FEATURE_TABLE = not _encoded_time_features
+if _encoded_time_features:
+    logger.warning(
+        f"Global encoders cover time features {sorted(_encoded_time_features)}; "
+        "encoding time features per request instead of using TIME_FEATURE_TABLE"
+    )
+
 # Load Layer 3 Local Model Encoders
 try:
     with open("app/ml_models/label_encoders.pkl", "rb") as f:
@@ -57,9 +71,22 @@ except FileNotFoundError:
     logger.error("Local frequency encoders file not found")
     local_freq_encoders = {}
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate the great circle distance between two points on earth"""
-    R = 6371  # Earth's radius in kilometers
+# Optional ONNX export of the global model; used instead of the pickle when present
+global_model_onnx = None
+try:
+    import onnxruntime
+    if os.path.exists("app/ml_models/global_model.onnx"):
+        global_model_onnx = onnxruntime.InferenceSession(
+            "app/ml_models/global_model.onnx", providers=["CPUExecutionProvider"])
+        logger.info("Global ONNX model loaded successfully")
+except ImportError:
+    logger.info("onnxruntime not installed, using pickled global model")
+except Exception as e:
+    logger.error(f"Global ONNX model failed to load, using pickled global model: {str(e)}")
+
+@njit(cache=True)
+def _haversine_km(lat1, lon1, lat2, lon2):
+    R = 6371.0  # Earth's radius in kilometers
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
     a = (
@@ -70,6 +97,36 @@ def haversine(lat1, lon1, lat2, lon2):
     )
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
+@njit(cache=True)
+def _consecutive_distances(lats, lons):
+    """Distances between consecutive points, skipping pairs with a missing (0) coordinate"""
+    out = np.empty(max(len(lats) - 1, 0))
+    count = 0
+    for i in range(1, len(lats)):
+        if lats[i] != 0 and lons[i] != 0 and lats[i - 1] != 0 and lons[i - 1] != 0:
+            out[count] = _haversine_km(lats[i - 1], lons[i - 1], lats[i], lons[i])
+            count += 1
+    return out[:count]
+
+# Compile both kernels (or load them from the cache) at import, not on the first transaction
+_consecutive_distances(np.zeros(2, dtype=np.float64), np.zeros(2, dtype=np.float64))
+_haversine_km(0.0, 0.0, 0.0, 0.0)
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate the great circle distance between two points on earth"""
+    return _haversine_km(float(lat1), float(lon1), float(lat2), float(lon2))
+
+def predict_global_scores(X_global):
+    """Fraud probability for each row, via ONNX Runtime when an export is available"""
+    if global_model_onnx is not None:
+        input_name = global_model_onnx.get_inputs()[0].name
+        probabilities = global_model_onnx.run(None, {input_name: X_global.astype(np.float32)})[1]
+        return np.array([row[1] for row in probabilities])
+    return global_model.predict_proba(X_global)[:, 1]
+
+# Concurrent requests share one global model call (up to 8 rows or 5 ms)
+global_batcher = InferenceBatcher(predict_global_scores, max_batch=8, max_wait=0.005)
+
 def calculate_amount_bin(amount):
     """Calculate amount bin for global model using the specified ranges"""
     amount = float(amount)
@@ -114,31 +171,37 @@ def calculate_amount_stats_from_db(db, user_id=None):
     
     return amount_mean, amount_std
 
+# The pipeline runs in threadpool workers and new categories are appended to the shared
+# module-level encoders, so the check-and-add has to happen under one lock
+_encoder_lock = threading.Lock()
+
 def handle_new_category_label_encoder(encoder, value):
     """Handle new categories for label encoders by adding them with new IDs"""
     str_value = str(value) if value is not None else "Unknown"
     
-    if not hasattr(encoder, 'classes_'):
-        # Initialize if classes_ doesn't exist
-        encoder.classes_ = np.array([str_value])
-        return 0
-    
-    if str_value in encoder.classes_:
-        return encoder.transform([str_value])[0]
-    else:
-        # Add new category with next available ID
-        new_id = len(encoder.classes_)
-        encoder.classes_ = np.append(encoder.classes_, str_value)
-        return new_id
+    with _encoder_lock:
+        if not hasattr(encoder, 'classes_'):
+            # Initialize if classes_ doesn't exist
+            encoder.classes_ = np.array([str_value])
+            return 0
+        
+        if str_value in encoder.classes_:
+            return encoder.transform([str_value])[0]
+        else:
+            # Add new category with next available ID
+            new_id = len(encoder.classes_)
+            encoder.classes_ = np.append(encoder.classes_, str_value)
+            return new_id
 
 def handle_new_category_freq_encoder(encoder_dict, value):
     """Handle new categories for frequency encoders by adding them with frequency 1"""
     str_value = str(value) if value is not None else "Unknown"
     
-    if str_value not in encoder_dict:
-        encoder_dict[str_value] = 1  # Start with frequency 1 for new categories
-    
-    return encoder_dict[str_value]
+    with _encoder_lock:
+        if str_value not in encoder_dict:
+            encoder_dict[str_value] = 1  # Start with frequency 1 for new categories
+        
+        return encoder_dict[str_value]
 
 def encode_categorical_features(data_dict, label_encoders, freq_encoders):
     """Encode categorical features using label encoders and frequency encoders with fallback for new categories"""
@@ -167,12 +230,17 @@ def prepare_global_features(transaction_obj, profile_obj, amount_mean, amount_st
         "TRANSACTION_TYPE": transaction_obj.transaction_type if transaction_obj.transaction_type else "P2P",
         "IS_FRAUD": 0,  # Placeholder, not used for prediction
         "AMOUNT_BIN": calculate_amount_bin(amount),
-        "IS_AMOUNT_OUTLIER": is_amount_outlier(amount, amount_mean, amount_std),
-        "DAY_OF_WEEK": transaction_obj.day_of_week if transaction_obj.day_of_week is not None else 0,
-        "HOUR": transaction_obj.hour if transaction_obj.hour is not None else 0,
-        "MINUTE": transaction_obj.minute if transaction_obj.minute is not None else 0,
-        "IS_NIGHT": int(transaction_obj.is_night) if transaction_obj.is_night is not None else 0
+        "IS_AMOUNT_OUTLIER": is_amount_outlier(amount, amount_mean, amount_std)
     }
+    # DAY_OF_WEEK, HOUR, MINUTE and IS_NIGHT come from the precomputed time feature table,
+    # unless the encoders cover them and they have to go through encode_categorical_features
+    if not USE_TIME_FEATURE_TABLE:
+        global_features.update({
+            "DAY_OF_WEEK": transaction_obj.day_of_week if transaction_obj.day_of_week is not None else 0,
+            "HOUR": transaction_obj.hour if transaction_obj.hour is not None else 0,
+            "MINUTE": transaction_obj.minute if transaction_obj.minute is not None else 0,
+            "IS_NIGHT": int(transaction_obj.is_night) if transaction_obj.is_night is not None else 0
+        })
     
     return global_features
 
@@ -306,15 +374,10 @@ def get_user_transaction_stats(db_session, user_id):
     
     amounts = [float(txn.amount) for txn in user_transactions if txn.amount is not None]
     
-    # Calculate distances - need to add this field to transaction model or calculate dynamically
-    distances = []
-    for i, txn in enumerate(user_transactions[1:], 1):
-        prev_txn = user_transactions[i-1]
-        if (txn.latitude and txn.longitude and 
-            prev_txn.latitude and prev_txn.longitude):
-            dist = haversine(prev_txn.latitude, prev_txn.longitude,
-                           txn.latitude, txn.longitude)
-            distances.append(dist)
+    # Calculate distances between consecutive transactions (missing coordinates as 0 are skipped)
+    lats = np.array([float(txn.latitude or 0) for txn in user_transactions], dtype=np.float64)
+    lons = np.array([float(txn.longitude or 0) for txn in user_transactions], dtype=np.float64)
+    distances = _consecutive_distances(lats, lons).tolist()
     
     if not distances:
         distances = [0]
@@ -445,18 +508,27 @@ def run_fraud_pipeline(transaction_obj, profile_obj, txn_count: int, last_transa
 
     # --- LAYER 1: Global Model Prediction ---
     global_score = 0.5  # Default score
-    if global_model is not None:
+    if global_model is not None or global_model_onnx is not None:
         global_features = prepare_global_features(transaction_obj, profile_obj, amount_mean, amount_std)
         global_features_encoded = encode_categorical_features(
             global_features, global_label_encoders, global_freq_encoders)
         
         # Convert to array for prediction (maintaining order as specified)
         feature_order = ["AMOUNT", "PAYER_VPA", "BENEFICIARY_VPA", "INITIATION_MODE", 
-                        "TRANSACTION_TYPE", "AMOUNT_BIN", "IS_AMOUNT_OUTLIER",
-                        "DAY_OF_WEEK", "HOUR", "MINUTE", "IS_NIGHT"]
+                        "TRANSACTION_TYPE", "AMOUNT_BIN", "IS_AMOUNT_OUTLIER"]
         
-        X_global = np.array([[global_features_encoded.get(feature, 0) for feature in feature_order]])
-        global_score = global_model.predict_proba(X_global)[0][1]
+        # Time features (DAY_OF_WEEK, HOUR, MINUTE, IS_NIGHT) are appended as one precomputed row
+        if USE_TIME_FEATURE_TABLE:
+            X_global = np.concatenate((
+                np.array([global_features_encoded.get(feature, 0) for feature in feature_order], dtype=np.float64),
+                time_feature_row(transaction_obj.day_of_week, transaction_obj.hour, transaction_obj.minute)
+            ))
+        else:
+            X_global = np.array(
+                [global_features_encoded.get(feature, 0) for feature in feature_order + TIME_FEATURES],
+                dtype=np.float64
+            )
+        global_score = global_batcher.submit(X_global)
 
     # --- LAYER 2: Real-time Heuristics Check ---
     layer2_result = layer2_heuristics_check(transaction_obj, profile_obj)
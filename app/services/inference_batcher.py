@@ -0,0 +1,84 @@
+# services/inference_batcher.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    Coalesces single-row predictions from concurrent requests into one (B, F) model call.
+
+    The fraud pipeline runs in threadpool workers, so callers block on submit() while a
+    single background thread collects up to max_batch rows or waits max_wait seconds.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 8,
+        max_wait: float = 0.005,
+        timeout: float = 10.0,
+    ):
+        self._predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, features) -> float:
+        """Score one feature row, sharing the model call with any concurrent submissions"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(features, dtype=np.float64), future))
+        # Bounded so a stuck model call can't hold a threadpool worker forever
+        return future.result(timeout=self.timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Any failure is handed to the callers; the worker itself must keep running
+            try:
+                X = np.stack([features for features, _ in batch])
+                scores = self._predict_fn(X)
+                if len(scores) != len(batch):
+                    raise ValueError(f"model returned {len(scores)} scores for {len(batch)} rows")
+                results = [float(score) for score in scores]
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} rows: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,51 @@
+# services/otp_store.py
+from app.services.redis_client import redis as _redis
+
+OTP_TTL_SECONDS = 600  # 10 minutes, as promised in the OTP email
+MAX_OTP_ATTEMPTS = 5  # Wrong guesses allowed before the code is invalidated
+
+# Compare-and-delete in one step so a resend can't land between the read and the delete.
+# A wrong guess bumps the attempt counter; the code is dropped once it hits the limit.
+_VERIFY_OTP_SCRIPT = _redis.register_script("""
+local stored = redis.call('GET', KEYS[1])
+if not stored then
+    return 0
+end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return 1
+end
+local attempts = redis.call('INCR', KEYS[2])
+if attempts == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return 0
+""")
+
+
+def _otp_key(key: str) -> str:
+    return f"otp:{key}"
+
+
+def _attempts_key(key: str) -> str:
+    return f"otp_attempts:{key}"
+
+
+async def set_otp(key: str, otp, ttl: int = OTP_TTL_SECONDS):
+    """Store an OTP that expires on its own after ttl seconds; a new code gets a fresh attempt budget"""
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.setex(_otp_key(key), ttl, str(otp))
+        pipe.delete(_attempts_key(key))
+        await pipe.execute()
+
+
+async def verify_otp(key: str, otp) -> bool:
+    """Consume the stored OTP if it matches; after MAX_OTP_ATTEMPTS wrong guesses it is invalidated"""
+    matched = await _VERIFY_OTP_SCRIPT(
+        keys=[_otp_key(key), _attempts_key(key)],
+        args=[str(otp), MAX_OTP_ATTEMPTS, OTP_TTL_SECONDS],
+    )
+    return matched == 1
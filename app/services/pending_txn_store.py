@@ -0,0 +1,28 @@
+# services/pending_txn_store.py
+import orjson
+from typing import Optional
+
+from app.services.redis_client import redis as _redis
+
+# Suspicious transactions wait this long for step-up verification
+PENDING_TTL_SECONDS = 600
+
+
+def _pending_key(txn_id: str) -> str:
+    return f"pending_txn:{txn_id}"
+
+
+async def save_pending(txn_id: str, data: dict, ttl: int = PENDING_TTL_SECONDS):
+    """Hold a transaction that needs step-up verification before it is saved"""
+    await _redis.setex(_pending_key(txn_id), ttl, orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+async def get_pending(txn_id: str) -> Optional[dict]:
+    raw = await _redis.get(_pending_key(txn_id))
+    return orjson.loads(raw) if raw else None
+
+
+async def pop_pending(txn_id: str) -> Optional[dict]:
+    """Atomically take the pending transaction so it is saved at most once"""
+    raw = await _redis.getdel(_pending_key(txn_id))
+    return orjson.loads(raw) if raw else None
@@ -0,0 +1,11 @@
+# services/redis_client.py
+from redis.asyncio import Redis
+
+from app.config import settings
+
+# Shared by every worker, so state written by one is visible to the others
+redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+async def close():
+    await redis.aclose()
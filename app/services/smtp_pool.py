@@ -0,0 +1,129 @@
+# services/smtp_pool.py
+import logging
+import queue
+import smtplib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.config import settings
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Idle sessions kept per (host, port, user)
+POOL_SIZE = 4
+SMTP_TIMEOUT = 10
+
+PoolKey = Tuple[str, int, str]
+
+_pools: Dict[PoolKey, "queue.Queue[PooledSMTP]"] = {}
+_pools_lock = threading.Lock()
+
+
+class PooledSMTP(smtplib.SMTP):
+    """SMTP session that is already STARTTLS'd and logged in, and can re-open itself"""
+
+    def __init__(self, host: str, port: int, user: str, password: str):
+        super().__init__(timeout=SMTP_TIMEOUT)
+        self.pool_key: PoolKey = (host, port, user)
+        self._password = password
+        self._open()
+
+    def _open(self):
+        host, port, user = self.pool_key
+        self.connect(host, port)
+        self.starttls()
+        self.login(user, self._password)
+
+    def reconnect(self):
+        """Drop the current socket and open a fresh authenticated session"""
+        self.close()
+        self.helo_resp = None
+        self.ehlo_resp = None
+        self.esmtp_features = {}
+        self._open()
+
+    def is_alive(self) -> bool:
+        try:
+            return self.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+
+def _get_pool(key: PoolKey) -> "queue.Queue[PooledSMTP]":
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = queue.Queue(maxsize=POOL_SIZE)
+        return pool
+
+
+def _discard(server: PooledSMTP):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _acquire(host: str, port: int, user: str, password: str) -> PooledSMTP:
+    pool = _get_pool((host, port, user))
+    while True:
+        try:
+            server = pool.get_nowait()
+        except queue.Empty:
+            return PooledSMTP(host, port, user, password)
+        if server.is_alive():
+            return server
+        _discard(server)
+
+
+def _release(server: PooledSMTP):
+    try:
+        _get_pool(server.pool_key).put_nowait(server)
+    except queue.Full:
+        _discard(server)
+
+
+@contextmanager
+def get_smtp(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    user: Optional[str] = None,
+    password: Optional[str] = None,
+) -> Iterator[PooledSMTP]:
+    """
+    Borrow a logged-in SMTP session from the pool, falling back to the configured
+    SMTP settings. The session goes back to the pool unless the block raised.
+    """
+    server = _acquire(
+        host or settings.SMTP_SERVER,
+        int(port or settings.SMTP_PORT),
+        user or settings.SMTP_EMAIL,
+        password or settings.SMTP_PASSWORD,
+    )
+    try:
+        yield server
+    except Exception:
+        server.close()
+        raise
+    _release(server)
+
+
+def close_all():
+    """Quit every pooled SMTP session (called on application shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    closed = 0
+    for pool in pools:
+        while True:
+            try:
+                server = pool.get_nowait()
+            except queue.Empty:
+                break
+            _discard(server)
+            closed += 1
+    logger.info(f"Closed {closed} pooled SMTP sessions")
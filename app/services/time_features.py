@@ -0,0 +1,24 @@
+# services/time_features.py
+import numpy as np
+
+# Time features of the global model, in the order it was trained on
+TIME_FEATURES = ["DAY_OF_WEEK", "HOUR", "MINUTE", "IS_NIGHT"]
+
+# Transactions before 06:00 or after 22:59 count as night
+IS_NIGHT_BY_HOUR = tuple(hour < 6 or hour > 22 for hour in range(24))
+
+
+def _build_time_feature_table() -> np.ndarray:
+    day_of_week, hour, minute = np.meshgrid(np.arange(7), np.arange(24), np.arange(60), indexing="ij")
+    is_night = np.asarray(IS_NIGHT_BY_HOUR)[hour]
+    return np.stack([day_of_week, hour, minute, is_night], axis=-1).astype(np.float64)
+
+
+# TIME_FEATURE_TABLE[day_of_week, hour, minute] is the encoded time-feature row for that minute
+TIME_FEATURE_TABLE = _build_time_feature_table()
+TIME_FEATURE_TABLE.flags.writeable = False
+
+
+def time_feature_row(day_of_week, hour, minute) -> np.ndarray:
+    """Look up the precomputed time features, treating missing values as 0 like the model inputs always have"""
+    return TIME_FEATURE_TABLE[day_of_week or 0, hour or 0, minute or 0]
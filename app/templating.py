@@ -0,0 +1,33 @@
+import json
+import os
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.config import settings
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Add custom filter for parsing JSON
+def parse_json(text):
+    if not text:
+        return {}
+    try:
+        return json.loads(text)
+    except:
+        return {}
+
+def _create_templates(directory: str) -> Jinja2Templates:
+    """Jinja2Templates backed by a bytecode cache, with source re-checks only when DEBUG is on"""
+    env = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        # Jinja's default cache dir is per-user, mode 0700 and ownership-checked
+        bytecode_cache=FileSystemBytecodeCache(),
+        auto_reload=settings.DEBUG,
+        cache_size=400,
+    )
+    env.filters["from_json"] = parse_json
+    env.filters["zip"] = zip
+    return Jinja2Templates(env=env)
+
+# One environment, and so one compiled-template cache, shared by every router
+templates = _create_templates(TEMPLATES_DIR)